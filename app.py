@@ -7,9 +7,14 @@ app_dir = os.environ.get('APP_DIR', CURRENT_DIR)
 sys.path.append(CURRENT_DIR)
 import datetime
 import shutil
+import sqlite3
 import queue
 from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, Response, current_app, session, send_file, make_response, g
+from flask.json.provider import DefaultJSONProvider
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import load_only
 from flask_migrate import Migrate
 from flask_wtf import FlaskForm
 from flask_wtf.csrf import CSRFProtect
@@ -50,6 +55,7 @@ from wtforms import SubmitField
 from package import package_bp
 from flasgger import Swagger, swag_from # Import Flasgger
 from copy import deepcopy
+from functools import lru_cache
 import tempfile
 from logging.handlers import RotatingFileHandler
 
@@ -69,6 +75,7 @@ app.config['UPLOAD_FOLDER'] = os.path.join(CURRENT_DIR, 'static', 'uploads')  #
 app.config['APP_BASE_URL'] = os.environ.get('APP_BASE_URL', 'http://localhost:5000')
 app.config['HAPI_FHIR_URL'] = os.environ.get('HAPI_FHIR_URL', 'http://localhost:8080/fhir')
 CONFIG_PATH = os.environ.get('CONFIG_PATH', '/usr/local/tomcat/conf/application.yaml')
+UPLOAD_SAVE_BUFFER_SIZE = 1024 * 1024 # FileStorage.save copy buffer (Werkzeug default is 16KB)
 
 # Basic Swagger configuration
 app.config['SWAGGER'] = {
@@ -122,8 +129,12 @@ package_cache = TTLCache(maxsize=100, ttl=300)
 #-----------------------------------------------------------------------------------------------------------------------
 # --- Basic Logging Setup (adjust level and format as needed) ---
 # Configure root logger first - This sets the foundation
-# Set level to DEBUG initially to capture everything, handlers can filter later
-logging.basicConfig(level=logging.DEBUG,
+# Defaults to DEBUG to capture everything; set LOG_LEVEL (e.g. INFO) to skip debug formatting in production
+_requested_log_level = (os.environ.get('LOG_LEVEL') or 'DEBUG').strip().upper()
+# An unknown name would make basicConfig raise at import and stop the app from starting.
+# getLevelName() maps a known level name to its number and anything else to a 'Level ...' string.
+LOG_LEVEL = _requested_log_level if isinstance(logging.getLevelName(_requested_log_level), int) else 'DEBUG'
+logging.basicConfig(level=LOG_LEVEL,
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
                     # Force=True might be needed if basicConfig was called elsewhere implicitly
                     # force=True
@@ -132,7 +143,9 @@ logging.basicConfig(level=logging.DEBUG,
 # Get the application logger (for app-specific logs)
 logger = logging.getLogger(__name__)
 # Explicitly set the app logger's level (can be different from root)
-logger.setLevel(logging.DEBUG)
+logger.setLevel(LOG_LEVEL)
+if LOG_LEVEL != _requested_log_level:
+    logger.warning(f"Unknown LOG_LEVEL '{_requested_log_level}'; falling back to DEBUG.")
 
 # --- Optional: Add File Handler for Debugging ---
 # Ensure the instance path exists before setting up the file handler
@@ -147,11 +160,11 @@ try:
     # Rotate logs: 5 files, 5MB each
     file_handler = RotatingFileHandler(log_file_path, maxBytes=5*1024*1024, backupCount=5, encoding='utf-8')
     file_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
-    # Set the file handler level - DEBUG will capture everything
-    file_handler.setLevel(logging.DEBUG)
+    # Set the file handler level - follows LOG_LEVEL (DEBUG by default)
+    file_handler.setLevel(LOG_LEVEL)
     # Add handler to the *root* logger to capture logs from all modules (like services)
     logging.getLogger().addHandler(file_handler)
-    logger.info(f"--- File logging initialized to {log_file_path} (Level: DEBUG) ---")
+    logger.info(f"--- File logging initialized to {log_file_path} (Level: {LOG_LEVEL}) ---")
 except Exception as e:
     # Log error if file handler setup fails, but continue execution
     logger.error(f"Failed to set up file logging to {log_file_path}: {e}", exc_info=True)
@@ -231,7 +244,41 @@ try:
 except Exception as e:
     logger.error(f"Failed to create/verify directories: {e}", exc_info=True)
 
+# ProcessedIg/CachedPackage JSON columns are (de)serialized by the engine; use orjson when available
+if services.HAS_ORJSON:
+    import orjson
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'json_serializer': lambda obj: orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode('utf-8'),
+        'json_deserializer': orjson.loads,
+    }
+
+    class OrjsonJSONProvider(DefaultJSONProvider):
+        """jsonify()/request.get_json() via orjson; dates, UUIDs etc. still go through Flask's default hook."""
+        def dumps(self, obj, **kwargs):
+            option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+            if kwargs.get('sort_keys', self.sort_keys):
+                option |= orjson.OPT_SORT_KEYS
+            if kwargs.get('indent'):
+                option |= orjson.OPT_INDENT_2
+            return orjson.dumps(obj, default=self.default, option=option).decode('utf-8')
+
+        def loads(self, s, **kwargs):
+            return orjson.loads(s)
+
+    app.json = OrjsonJSONProvider(app)
+
 db = SQLAlchemy(app)
+
+@event.listens_for(Engine, 'connect')
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """WAL lets page reads proceed during background cache/import writes; NORMAL sync is safe under WAL."""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute('PRAGMA temp_store=MEMORY')
+    cursor.close()
 csrf = CSRFProtect(app)
 migrate = Migrate(app, db)
 
@@ -552,7 +599,7 @@ def manual_import_ig():
                 tgz_file = form.tgz_file.data
                 temp_dir = tempfile.mkdtemp()
                 temp_path = os.path.join(temp_dir, secure_filename(tgz_file.filename))
-                tgz_file.save(temp_path)
+                tgz_file.save(temp_path, buffer_size=UPLOAD_SAVE_BUFFER_SIZE)
                 result = import_manual_package_and_dependencies(temp_path, dependency_mode=dependency_mode, is_file=True, resolve_dependencies=resolve_dependencies)
                 identifier = result.get('requested', tgz_file.filename)
                 shutil.rmtree(temp_dir, ignore_errors=True)
@@ -584,7 +631,7 @@ def manual_import_ig():
                     flash(f"Successfully imported {identifier}! Mode: {dependency_mode}", "success")
                 if is_ajax:
                     return jsonify({"status": "success", "message": f"Imported {identifier}", "redirect": url_for('view_igs')}), 200
-                return redirect(url_for('view_igs'))
+                return redirect(url_for('view_igs'), code=303)
         except Exception as e:
             logger.error(f"Unexpected error during manual IG import: {str(e)}", exc_info=True)
             flash(f"An unexpected error occurred: {str(e)}", "error")
@@ -639,7 +686,7 @@ def import_ig():
                     flash(f"Successfully downloaded {name}#{version} and dependencies! Mode: {dependency_mode}", "success")
                 if is_ajax:
                     return jsonify({"status": "success", "message": f"Imported {name}#{version}", "redirect": url_for('view_igs')}), 200
-                return redirect(url_for('view_igs'))
+                return redirect(url_for('view_igs'), code=303)
         except Exception as e:
             logger.error(f"Unexpected error during IG import: {str(e)}", exc_info=True)
             flash(f"An unexpected error occurred downloading the IG: {str(e)}", "error")
@@ -846,7 +893,10 @@ def stream_import_logs():
 @app.route('/view-igs')
 def view_igs():
     form = FlaskForm()
-    processed_igs = ProcessedIg.query.order_by(ProcessedIg.package_name, ProcessedIg.version).all()
+    # The list only shows names, versions and resource type badges; skip the MS/examples JSON blobs
+    processed_igs = ProcessedIg.query.options(
+        load_only(ProcessedIg.id, ProcessedIg.package_name, ProcessedIg.version, ProcessedIg.resource_types_info)
+    ).order_by(ProcessedIg.package_name, ProcessedIg.version).all()
     processed_ids = {(ig.package_name, ig.version) for ig in processed_igs}
     packages_dir = app.config['FHIR_PACKAGES_DIR']
     packages, errors, duplicate_groups = list_downloaded_packages(packages_dir)
@@ -875,7 +925,9 @@ def about():
 def push_igs():
     # form = FlaskForm() # OLD - Replace this line
     form = IgImportForm() # Use a real form class that has CSRF handling built-in
-    processed_igs = ProcessedIg.query.order_by(ProcessedIg.package_name, ProcessedIg.version).all()
+    processed_igs = ProcessedIg.query.options(
+        load_only(ProcessedIg.package_name, ProcessedIg.version)
+    ).order_by(ProcessedIg.package_name, ProcessedIg.version).all()
     processed_ids = {(ig.package_name, ig.version) for ig in processed_igs}
     packages_dir = app.config['FHIR_PACKAGES_DIR']
     packages, errors, duplicate_groups = list_downloaded_packages(packages_dir)
@@ -899,11 +951,11 @@ def process_ig():
         # --- Keep existing filename and path validation ---
         if not filename or not filename.endswith('.tgz'):
             flash("Invalid package file selected.", "error")
-            return redirect(url_for('view_igs'))
+            return redirect(url_for('view_igs'), code=303)
         tgz_path = os.path.join(app.config['FHIR_PACKAGES_DIR'], filename)
         if not os.path.exists(tgz_path):
             flash(f"Package file not found: {filename}", "error")
-            return redirect(url_for('view_igs'))
+            return redirect(url_for('view_igs'), code=303)
 
         name, version = services.parse_package_filename(filename)
         if not name: # Add fallback naming if parse fails
@@ -962,7 +1014,7 @@ def process_ig():
         logger.warning(f"Form validation failed for process-igs: {form.errors}")
         flash("CSRF token missing or invalid, or other form error.", "error")
 
-    return redirect(url_for('view_igs'))
+    return redirect(url_for('view_igs'), code=303)
 
 # --- End of /process-igs Function ---
 
@@ -973,7 +1025,7 @@ def delete_ig():
         filename = request.form.get('filename')
         if not filename or not filename.endswith('.tgz'):
             flash("Invalid package file specified.", "error")
-            return redirect(url_for('view_igs'))
+            return redirect(url_for('view_igs'), code=303)
         tgz_path = os.path.join(app.config['FHIR_PACKAGES_DIR'], filename)
         metadata_path = tgz_path.replace('.tgz', '.metadata.json')
         deleted_files = []
@@ -996,6 +1048,14 @@ def delete_ig():
             except OSError as e:
                 errors.append(f"Could not delete metadata for {filename}: {e}")
                 logger.error(f"Error deleting {metadata_path}: {e}")
+        # Cache files written by extract_dependencies/process_package_file; not reported to the user
+        for cache_path in (services.dependencies_cache_path(tgz_path), services.scan_cache_path(tgz_path)):
+            if os.path.exists(cache_path):
+                try:
+                    os.remove(cache_path)
+                    logger.info(f"Deleted cache file: {cache_path}")
+                except OSError as e:
+                    logger.warning(f"Error deleting {cache_path}: {e}")
         if errors:
             for error in errors:
                 flash(error, "error")
@@ -1006,7 +1066,7 @@ def delete_ig():
     else:
         logger.warning(f"Form validation failed for delete-ig: {form.errors}")
         flash("CSRF token missing or invalid.", "error")
-    return redirect(url_for('view_igs'))
+    return redirect(url_for('view_igs'), code=303)
 
 @app.route('/unload-ig', methods=['POST'])
 def unload_ig():
@@ -1040,7 +1100,7 @@ def unload_ig():
     else:
         logger.warning(f"Form validation failed for unload-ig: {form.errors}")
         flash("CSRF token missing or invalid.", "error")
-    return redirect(url_for('view_igs'))
+    return redirect(url_for('view_igs'), code=303)
 
 @app.route('/view-ig/<int:processed_ig_id>')
 def view_ig(processed_ig_id):
@@ -1151,7 +1211,7 @@ def collect_all_structure_definitions(tgz_path):
             for member in tar:
                 if not (member.isfile() and member.name.startswith('package/') and member.name.lower().endswith('.json')):
                     continue
-                if os.path.basename(member.name).lower() in ['package.json', '.index.json', 'validation-summary.json', 'validation-oo.json']:
+                if os.path.basename(member.name).lower() in services.PACKAGE_METADATA_FILENAMES:
                     continue
                 fileobj = None
                 try:
@@ -1300,7 +1360,7 @@ def get_structure():
     core_package_exists = os.path.exists(core_tgz_path)
     if primary_package_exists:
         try:
-            sd_data, _ = services.find_and_extract_sd(tgz_path, resource_type, profile_url=profile_url, include_narrative=include_narrative, raw=raw)
+            sd_data, _ = services.find_and_extract_sd(tgz_path, resource_type, profile_url=profile_url, include_narrative=include_narrative)
             if sd_data:
                 base_resource_type_for_sp = sd_data.get('type')
                 logger.debug(f"Determined base resource type '{base_resource_type_for_sp}' from primary SD '{resource_type}'")
@@ -1313,7 +1373,7 @@ def get_structure():
             error_message = f"SD for '{resource_type}' not found in primary package, and core package is missing." if primary_package_exists else f"Primary package {package_name}#{version} and core package are missing."
             return jsonify({"error": error_message}), 500 if primary_package_exists else 404
         try:
-            sd_data, _ = services.find_and_extract_sd(core_tgz_path, resource_type, profile_url=profile_url, include_narrative=include_narrative, raw=raw)
+            sd_data, _ = services.find_and_extract_sd(core_tgz_path, resource_type, profile_url=profile_url, include_narrative=include_narrative)
             if sd_data is not None:
                 fallback_used = True
                 source_package_id = services.CANONICAL_PACKAGE_ID
@@ -1709,18 +1769,15 @@ def validate_sample():
     if os.path.exists(packages_dir):
         for filename in os.listdir(packages_dir):
             if filename.endswith('.tgz'):
+                package_file_path = os.path.join(packages_dir, filename)
                 try:
-                    with tarfile.open(os.path.join(packages_dir, filename), 'r:gz') as tar:
-                        package_json = tar.extractfile('package/package.json')
-                        if package_json:
-                            pkg_info = json.load(package_json)
-                            name = pkg_info.get('name')
-                            version = pkg_info.get('version')
-                            if name and version:
-                                packages.append({'name': name, 'version': version})
-                except Exception as e:
+                    package_id = _read_package_choice(package_file_path, os.path.getmtime(package_file_path))
+                except OSError as e:
                     logger.warning(f"Error reading package {filename}: {e}")
                     continue
+                if package_id:
+                    name, version = package_id.split('#', 1)
+                    packages.append({'name': name, 'version': version})
     return render_template(
         'validate_sample.html',
         form=form,
@@ -1952,6 +2009,53 @@ def load_ig_to_hapi():
 
 # Assuming 'app' and 'logger' are defined, and other necessary imports are present above
 
+@lru_cache(maxsize=512)
+def _read_package_choice(package_file_path, mtime):
+    """
+    Returns 'name#version' from a package's package/package.json for the FSH converter and
+    validation package lists, or None if it can't be read. Cached per (path, mtime) so the archives
+    are only opened again when a package file changes, not on every page load.
+    """
+    filename = os.path.basename(package_file_path)
+    try:
+        # Check if it's a valid tar.gz file before opening
+        if not tarfile.is_tarfile(package_file_path):
+             logger.warning(f"Skipping non-tarfile or corrupted file: {filename}")
+             return None
+
+        with tarfile.open(package_file_path, 'r:gz') as tar:
+            # package/package.json is normally the first member, so iterating stops almost immediately
+            # instead of indexing (and inflating) the whole archive the way a lookup by name would
+            package_json_path = next((m for m in tar if m.name == 'package/package.json' and m.isfile()), None)
+
+            if package_json_path:
+                package_json_stream = tar.extractfile(package_json_path)
+                if package_json_stream:
+                    try:
+                        pkg_info = json.load(package_json_stream)
+                        name = pkg_info.get('name')
+                        version = pkg_info.get('version')
+                        if name and version:
+                            package_id = f"{name}#{version}"
+                            logger.debug(f"Added package: {package_id}")
+                            return package_id
+                        logger.warning(f"Missing name or version in {filename}/package.json: name={name}, version={version}")
+                    except json.JSONDecodeError as json_e:
+                        logger.warning(f"Error decoding package.json from {filename}: {json_e}")
+                    except Exception as read_e:
+                        logger.warning(f"Error reading stream from package.json in {filename}: {read_e}")
+                    finally:
+                        package_json_stream.close() # Ensure stream is closed
+                else:
+                     logger.warning(f"Could not extract package.json stream from {filename} (path: {package_json_path.name})")
+            else:
+                logger.warning(f"No suitable package.json found in {filename}")
+    except tarfile.ReadError as tar_e:
+         logger.warning(f"Tarfile read error for {filename}: {tar_e}")
+    except Exception as e:
+        logger.warning(f"Error processing package {filename}: {str(e)}")
+    return None
+
 @app.route('/fsh-converter', methods=['GET', 'POST'])
 def fsh_converter():
     form = FSHConverterForm()
@@ -1969,43 +2073,12 @@ def fsh_converter():
         for filename in tgz_files:
             package_file_path = os.path.join(packages_dir, filename)
             try:
-                # Check if it's a valid tar.gz file before opening
-                if not tarfile.is_tarfile(package_file_path):
-                     logger.warning(f"Skipping non-tarfile or corrupted file: {filename}")
-                     continue
-
-                with tarfile.open(package_file_path, 'r:gz') as tar:
-                    # Find package.json case-insensitively and handle potential path variations
-                    package_json_path = next((m for m in tar.getmembers() if m.name.lower().endswith('package.json') and m.isfile() and ('/' not in m.name.replace('package/','', 1).lower())), None) # Handle package/ prefix better
-
-                    if package_json_path:
-                        package_json_stream = tar.extractfile(package_json_path)
-                        if package_json_stream:
-                            try:
-                                pkg_info = json.load(package_json_stream)
-                                name = pkg_info.get('name')
-                                version = pkg_info.get('version')
-                                if name and version:
-                                    package_id = f"{name}#{version}"
-                                    packages.append((package_id, package_id))
-                                    logger.debug(f"Added package: {package_id}")
-                                else:
-                                    logger.warning(f"Missing name or version in {filename}/package.json: name={name}, version={version}")
-                            except json.JSONDecodeError as json_e:
-                                logger.warning(f"Error decoding package.json from {filename}: {json_e}")
-                            except Exception as read_e:
-                                logger.warning(f"Error reading stream from package.json in {filename}: {read_e}")
-                            finally:
-                                package_json_stream.close() # Ensure stream is closed
-                        else:
-                             logger.warning(f"Could not extract package.json stream from {filename} (path: {package_json_path.name})")
-                    else:
-                        logger.warning(f"No suitable package.json found in {filename}")
-            except tarfile.ReadError as tar_e:
-                 logger.warning(f"Tarfile read error for {filename}: {tar_e}")
-            except Exception as e:
+                package_id = _read_package_choice(package_file_path, os.path.getmtime(package_file_path))
+            except OSError as e:
                 logger.warning(f"Error processing package {filename}: {str(e)}")
-                continue # Continue to next file
+                continue
+            if package_id:
+                packages.append((package_id, package_id))
     else:
         logger.warning(f"Packages directory does not exist: {packages_dir}")
 
@@ -2127,7 +2200,9 @@ def upload_test_data():
     """Renders the page for uploading test data."""
     form = TestDataUploadForm()
     try:
-        processed_igs = ProcessedIg.query.order_by(ProcessedIg.package_name, ProcessedIg.version).all()
+        processed_igs = ProcessedIg.query.options(
+            load_only(ProcessedIg.package_name, ProcessedIg.version)
+        ).order_by(ProcessedIg.package_name, ProcessedIg.version).all()
         form.validation_package_id.choices = [('', '-- Select Package for Validation --')] + [
             (f"{ig.package_name}#{ig.version}", f"{ig.package_name}#{ig.version}") for ig in processed_igs ]
     except Exception as e:
@@ -2221,27 +2296,29 @@ def api_upload_test_data():
         if not uploaded_files or all(f.filename == '' for f in uploaded_files):
             return jsonify({"status": "error", "message": "No files selected."}), 400
 
+        # Validate every file name before any disk I/O, so a rejected batch writes nothing
+        allowed_extensions = {'.json', '.xml', '.zip'}
+        files_to_save = []
+        for file_storage in uploaded_files:
+            if file_storage and file_storage.filename:
+                filename = secure_filename(file_storage.filename)
+                if os.path.splitext(filename)[1].lower() not in allowed_extensions:
+                    error_msg = f"Invalid file type: '{filename}'. Only JSON, XML, ZIP allowed."
+                    logger.warning(f"Upload rejected: {error_msg}")
+                    return jsonify({"status": "error", "message": error_msg}), 400
+                files_to_save.append((file_storage, filename))
+        if not files_to_save:
+            logger.warning("Upload rejected: No valid files saved.")
+            return jsonify({"status": "error", "message": "No valid files saved."}), 400
+
         temp_dir = tempfile.mkdtemp(prefix='fhirflare_upload_')
         saved_file_paths = []
-        allowed_extensions = {'.json', '.xml', '.zip'}
         try:
-            for file_storage in uploaded_files:
-                if file_storage and file_storage.filename:
-                    filename = secure_filename(file_storage.filename)
-                    file_ext = os.path.splitext(filename)[1].lower()
-                    if file_ext not in allowed_extensions:
-                        raise ValueError(f"Invalid file type: '{filename}'. Only JSON, XML, ZIP allowed.")
-                    save_path = os.path.join(temp_dir, filename)
-                    file_storage.save(save_path)
-                    saved_file_paths.append(save_path)
-            if not saved_file_paths:
-                raise ValueError("No valid files saved.")
+            for file_storage, filename in files_to_save:
+                save_path = os.path.join(temp_dir, filename)
+                file_storage.save(save_path, buffer_size=UPLOAD_SAVE_BUFFER_SIZE)
+                saved_file_paths.append(save_path)
             logger.debug(f"Saved {len(saved_file_paths)} files to {temp_dir}")
-        except ValueError as ve:
-            if temp_dir and os.path.exists(temp_dir):
-                shutil.rmtree(temp_dir)
-            logger.warning(f"Upload rejected: {ve}")
-            return jsonify({"status": "error", "message": str(ve)}), 400
         except Exception as file_err:
             if temp_dir and os.path.exists(temp_dir):
                 shutil.rmtree(temp_dir)
@@ -2310,14 +2387,14 @@ def retrieve_split_data():
                 # Save uploaded ZIP to temporary file
                 temp_dir = tempfile.gettempdir()
                 zip_path = os.path.join(temp_dir, 'uploaded_bundles.zip')
-                form.bundle_zip.data.save(zip_path)
+                form.bundle_zip.data.save(zip_path, buffer_size=UPLOAD_SAVE_BUFFER_SIZE)
                 session['retrieve_params']['bundle_zip_path'] = zip_path
             flash('Bundle retrieval initiated. Download will start after processing.', 'info')
         elif form.submit_split.data:
             # Save uploaded ZIP to temporary file
             temp_dir = tempfile.gettempdir()
             zip_path = os.path.join(temp_dir, 'split_bundles.zip')
-            form.split_bundle_zip.data.save(zip_path)
+            form.split_bundle_zip.data.save(zip_path, buffer_size=UPLOAD_SAVE_BUFFER_SIZE)
             session['split_params'] = {'split_bundle_zip_path': zip_path}
             flash('Bundle splitting initiated. Download will start after processing.', 'info')
     return render_template('retrieve_split_data.html', form=form, site_name='FHIRFLARE IG Toolkit',
@@ -2577,7 +2654,8 @@ def search_and_import():
 
     in_memory_packages = app.config.get('MANUAL_PACKAGE_CACHE')
     in_memory_timestamp = app.config.get('MANUAL_CACHE_TIMESTAMP')
-    db_timestamp_info = RegistryCacheInfo.query.first()
+    # The DB timestamp is only needed to (re)build the in-memory cache; skip the query when it is already populated
+    db_timestamp_info = RegistryCacheInfo.query.first() if in_memory_packages is None else None
     db_timestamp = db_timestamp_info.last_fetch_timestamp if db_timestamp_info else None
     logger.debug(f"DB Timestamp: {db_timestamp}, In-Memory Timestamp: {in_memory_timestamp}")
 
@@ -2731,15 +2809,11 @@ def search_and_import():
     total_packages = len(normalized_packages) if normalized_packages else 0
     start = (page - 1) * per_page
     end = start + per_page
-    packages_processed_for_page = []
-    if normalized_packages:
-        for pkg_data in normalized_packages:
-            # Fall back to latest_absolute_version if latest_official_version is None
-            display_version = pkg_data.get('latest_official_version') or pkg_data.get('latest_absolute_version') or 'N/A'
-            pkg_data['display_version'] = display_version
-            packages_processed_for_page.append(pkg_data)
-
-    packages_on_page = packages_processed_for_page[start:end]
+    # Only the current page is rendered, so only its packages need a display version
+    packages_on_page = normalized_packages[start:end] if normalized_packages else []
+    for pkg_data in packages_on_page:
+        # Fall back to latest_absolute_version if latest_official_version is None
+        pkg_data['display_version'] = pkg_data.get('latest_official_version') or pkg_data.get('latest_absolute_version') or 'N/A'
     total_pages_calc = max(1, (total_packages + per_page - 1) // per_page)
 
     def iter_pages(left_edge=1, left_current=1, right_current=2, right_edge=1):
@@ -2826,17 +2900,14 @@ def api_search_packages():
         filtered_packages_raw = all_cached_packages
         logger.debug(f"No search term provided, using all {len(filtered_packages_raw)} cached packages.")
 
-    filtered_packages_processed = []
-    for pkg_data in filtered_packages_raw:
-        # Fall back to latest_absolute_version if latest_official_version is None
-        display_version = pkg_data.get('latest_official_version') or pkg_data.get('latest_absolute_version') or 'N/A'
-        pkg_data['display_version'] = display_version
-        filtered_packages_processed.append(pkg_data)
-
-    total_filtered = len(filtered_packages_processed)
+    total_filtered = len(filtered_packages_raw)
     start = (page - 1) * per_page
     end = start + per_page
-    packages_on_page = filtered_packages_processed[start:end]
+    # Only the current page is rendered, so only its packages need a display version
+    packages_on_page = filtered_packages_raw[start:end]
+    for pkg_data in packages_on_page:
+        # Fall back to latest_absolute_version if latest_official_version is None
+        pkg_data['display_version'] = pkg_data.get('latest_official_version') or pkg_data.get('latest_absolute_version') or 'N/A'
     total_pages_calc = max(1, (total_filtered + per_page - 1) // per_page)
 
     def iter_pages(left_edge=1, left_current=1, right_current=2, right_edge=1):
@@ -4,16 +4,53 @@ from wtforms import StringField, SelectField, TextAreaField, BooleanField, Submi
 from wtforms.validators import DataRequired, Regexp, ValidationError, URL, Optional, InputRequired
 from flask import request
 import json
-import xml.etree.ElementTree as ET
+from xml.parsers import expat
 import re
 import logging
 import os
+from urllib.parse import urlparse
 
 logger = logging.getLogger(__name__)
 
+# --- Check for optional 'orjson' library ---
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+# Validation patterns, compiled once at import rather than per form/validation call
+_PACKAGE_NAME_RE = re.compile(r'^[a-zA-Z0-9][a-zA-Z0-9\-\.]*[a-zA-Z0-9]$')
+_PACKAGE_VERSION_RE = re.compile(r'^[a-zA-Z0-9\.\-]+$')
+_DEPENDENCY_RE = re.compile(r'^[a-zA-Z0-9\-\.]+@[a-zA-Z0-9\.\-]+$')
+_FIRST_NON_SPACE_RE = re.compile(r'\S')
+_WHITESPACE_RE = re.compile(r'\s')
+# urlparse silently drops these, so 'http://a\tb/' would otherwise parse as host 'ab'
+_URL_STRIPPED_CHARS_RE = re.compile(r'[\t\r\n]')
+
+def http_url(message='Invalid URL.'):
+    """
+    URL validator for FHIR server base URLs: http(s) scheme plus a host, checked with urlparse.
+    Unlike WTForms' URL() it doesn't require a TLD, so http://localhost:8080/fhir and Docker
+    service names are accepted. A netloc without a usable host (':80', 'user@') is rejected.
+    """
+    def _validate(form, field):
+        value = field.data or ''
+        if _URL_STRIPPED_CHARS_RE.search(value):
+            raise ValidationError(message)
+        try:
+            parsed = urlparse(value)
+            hostname = parsed.hostname
+            parsed.port  # Raises ValueError for a non-numeric or out-of-range port
+        except ValueError:
+            raise ValidationError(message)
+        if parsed.scheme not in ('http', 'https') or not hostname or _WHITESPACE_RE.search(hostname):
+            raise ValidationError(message)
+    return _validate
+
 class RetrieveSplitDataForm(FlaskForm):
     """Form for retrieving FHIR bundles and splitting them into individual resources."""
-    fhir_server_url = StringField('FHIR Server URL', validators=[URL(), Optional()],
+    fhir_server_url = StringField('FHIR Server URL', validators=[Optional(), http_url()],
                                  render_kw={'placeholder': 'e.g., https://hapi.fhir.org/baseR4'})
     auth_type = SelectField('Authentication Type (for Custom URL)', choices=[
         ('none', 'None'),
@@ -62,11 +99,11 @@ class IgImportForm(FlaskForm):
     """Form for importing Implementation Guides."""
     package_name = StringField('Package Name', validators=[
         DataRequired(),
-        Regexp(r'^[a-zA-Z0-9][a-zA-Z0-9\-\.]*[a-zA-Z0-9]$', message="Invalid package name format.")
+        Regexp(_PACKAGE_NAME_RE, message="Invalid package name format.")
     ], render_kw={'placeholder': 'e.g., hl7.fhir.au.core'})
     package_version = StringField('Package Version', validators=[
         DataRequired(),
-        Regexp(r'^[a-zA-Z0-9\.\-]+$', message="Invalid version format. Use alphanumeric characters, dots, or hyphens (e.g., 1.2.3, 1.1.0-preview, current).")
+        Regexp(_PACKAGE_VERSION_RE, message="Invalid version format. Use alphanumeric characters, dots, or hyphens (e.g., 1.2.3, 1.1.0-preview, current).")
     ], render_kw={'placeholder': 'e.g., 1.1.0-preview'})
     dependency_mode = SelectField('Dependency Mode', choices=[
         ('recursive', 'Current Recursive'),
@@ -98,7 +135,9 @@ class ManualIgImportForm(FlaskForm):
         if not super().validate(extra_validators):
             return False
         mode = self.import_mode.data
-        has_file = request and request.files and self.tgz_file.name in request.files and request.files[self.tgz_file.name].filename != ''
+        files = (request.files if request else None) or {}
+        tgz_file_storage = files.get(self.tgz_file.name)
+        has_file = bool(tgz_file_storage and tgz_file_storage.filename)
         has_url = bool(self.tgz_url.data)  # Convert to boolean: True if non-empty string
 
         # Ensure exactly one input method is used
@@ -187,7 +226,9 @@ class FSHConverterForm(FlaskForm):
     def validate(self, extra_validators=None):
         if not super().validate(extra_validators):
             return False
-        has_file_in_request = request and request.files and self.fhir_file.name in request.files and request.files[self.fhir_file.name].filename != ''
+        files = (request.files if request else None) or {}
+        fhir_file_storage = files.get(self.fhir_file.name)
+        has_file_in_request = bool(fhir_file_storage and fhir_file_storage.filename)
         if self.input_mode.data == 'file' and not has_file_in_request:
             if not self.fhir_file.data:
                  self.fhir_file.errors.append('File is required when input mode is Upload File.')
@@ -197,24 +238,30 @@ class FSHConverterForm(FlaskForm):
             return False
         if self.input_mode.data == 'text' and self.fhir_text.data:
             try:
-                content = self.fhir_text.data.strip()
+                # Skip leading whitespace by position instead of copying the whole paste with strip();
+                # both parsers accept the trailing newline/spaces a paste usually ends with
+                first_char = _FIRST_NON_SPACE_RE.search(self.fhir_text.data)
+                content = self.fhir_text.data[first_char.start():] if first_char else ''
                 if not content: pass
-                elif content.startswith('{'): json.loads(content)
-                elif content.startswith('<'): ET.fromstring(content)
+                # orjson.JSONDecodeError subclasses json.JSONDecodeError, so the except below covers both
+                elif content.startswith('{'): orjson.loads(content) if HAS_ORJSON else json.loads(content)
+                # Well-formedness only: a bare expat parse, without building an element tree
+                elif content.startswith('<'): expat.ParserCreate().Parse(content, True)
                 else:
                     self.fhir_text.errors.append('Text input must be valid JSON or XML.')
                     return False
-            except (json.JSONDecodeError, ET.ParseError):
+            except (json.JSONDecodeError, expat.ExpatError):
                 self.fhir_text.errors.append('Invalid JSON or XML format.')
                 return False
         if self.dependencies.data:
-            for dep in self.dependencies.data.splitlines():
-                dep = dep.strip()
-                if dep and not re.match(r'^[a-zA-Z0-9\-\.]+@[a-zA-Z0-9\.\-]+$', dep):
-                    self.dependencies.errors.append(f'Invalid dependency format: "{dep}". Use package@version (e.g., hl7.fhir.us.core@6.1.0).')
-                    return False
-        has_alias_file_in_request = request and request.files and self.alias_file.name in request.files and request.files[self.alias_file.name].filename != ''
-        alias_file_data = self.alias_file.data or (request.files.get(self.alias_file.name) if request else None)
+            # Collect every bad line so the user can fix them all in one go
+            invalid_deps = [dep for dep in (line.strip() for line in self.dependencies.data.splitlines())
+                            if dep and not _DEPENDENCY_RE.match(dep)]
+            if invalid_deps:
+                quoted = ', '.join(f'"{dep}"' for dep in invalid_deps)
+                self.dependencies.errors.append(f'Invalid dependency format: {quoted}. Use package@version (e.g., hl7.fhir.us.core@6.1.0).')
+                return False
+        alias_file_data = self.alias_file.data or files.get(self.alias_file.name)
         if alias_file_data and alias_file_data.filename:
              if not alias_file_data.filename.lower().endswith('.fsh'):
                   self.alias_file.errors.append('Alias file should have a .fsh extension.')
@@ -222,7 +269,7 @@ class FSHConverterForm(FlaskForm):
 
 class TestDataUploadForm(FlaskForm):
     """Form for uploading FHIR test data."""
-    fhir_server_url = StringField('Target FHIR Server URL', validators=[DataRequired(), URL()],
+    fhir_server_url = StringField('Target FHIR Server URL', validators=[DataRequired(), http_url()],
                                   render_kw={'placeholder': 'e.g., http://localhost:8080/fhir'})
     auth_type = SelectField('Authentication Type', choices=[
         ('none', 'None'),
@@ -277,7 +324,7 @@ class TestDataUploadForm(FlaskForm):
         return True
 
 class FhirRequestForm(FlaskForm):
-    fhir_server_url = StringField('FHIR Server URL', validators=[URL(), Optional()],
+    fhir_server_url = StringField('FHIR Server URL', validators=[Optional(), http_url()],
                                  render_kw={'placeholder': 'e.g., https://hapi.fhir.org/baseR4'})
     auth_type = SelectField('Authentication Type (for Custom URL)', choices=[
         ('none', 'None'),
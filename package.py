@@ -2,12 +2,102 @@ from flask import Blueprint, jsonify, current_app, render_template
 import os
 import tarfile
 import json
-from datetime import datetime
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
 import time
+import threading
 from services import pkg_version, safe_parse_version
 
 package_bp = Blueprint('package', __name__)
 
+# Lower-cased name and reverse-dependency lookups over MANUAL_PACKAGE_CACHE. The cache is replaced
+# wholesale (never edited in place) when it is reloaded, so the index is rebuilt whenever a different
+# list object shows up. Each rebuild starts a fresh 'logs' memo, so per-package version history
+# never outlives the cache it was derived from.
+_package_index = {'source': None, 'by_name': {}, 'dependents': {}, 'logs': {}}
+_package_index_lock = threading.Lock()
+
+def _get_package_index(in_memory_cache):
+    global _package_index
+    with _package_index_lock:
+        if _package_index['source'] is not in_memory_cache:
+            by_name = {}
+            dependents_by_name = {}
+            for pkg in in_memory_cache:
+                if not isinstance(pkg, dict):
+                    continue
+                # First entry wins, matching the linear scan this replaces
+                by_name.setdefault((pkg.get('name') or '').lower(), pkg)
+                # Each package is listed once per dependency name, in cache order
+                dep_names = {(dep.get('name') or '').lower() for dep in pkg.get('dependencies') or [] if isinstance(dep, dict)}
+                if not dep_names:
+                    continue
+                # Table row for /dependents, built once and shared by every name it depends on
+                row = {
+                    "name": pkg.get('name', 'Unknown'),
+                    "version": pkg.get('latest_absolute_version', 'N/A'),
+                    "author": pkg.get('author', 'N/A'),
+                    "fhir_version": pkg.get('fhir_version', 'N/A'),
+                    "version_count": pkg.get('version_count', 0),
+                    "canonical": pkg.get('canonical', 'N/A')
+                }
+                for dep_name in dep_names:
+                    dependents_by_name.setdefault(dep_name, []).append(row)
+            _package_index = {
+                'source': in_memory_cache,
+                'by_name': by_name,
+                'dependents': dependents_by_name,
+                'logs': {}
+            }
+        return _package_index
+
+@lru_cache(maxsize=8192)
+def _parse_pub_date(pub_date_str):
+    """
+    Registry pubDate (RFC 2822, e.g. 'Mon, 01 Jan 2024 10:00:00 GMT') to a whole-second POSIX timestamp.
+    Many versions across packages share release dates, so results are memoized.
+    """
+    return int(parsedate_to_datetime(pub_date_str).timestamp())
+
+def _build_log_entries(name, versions):
+    """
+    (version, pubDate, timestamp) tuples for a package's version history, newest version first.
+    The timestamp is None when the pubDate could not be parsed.
+    """
+    current_app.logger.debug(f"Found {len(versions)} versions for package {name}: {versions[:5]}...")
+    entries = []
+    for version_info in versions:
+        if not isinstance(version_info, dict):
+            current_app.logger.warning(f"Invalid version info for {name}: {version_info}")
+            continue
+        version = version_info.get('version', '')
+        pub_date_str = version_info.get('pubDate', '')
+        if not version or not pub_date_str:
+            current_app.logger.warning(f"Skipping version info with missing version or pubDate: {version_info}")
+            continue
+        try:
+            pub_time = _parse_pub_date(pub_date_str)
+        except (TypeError, ValueError) as e:
+            current_app.logger.warning(f"Failed to parse pubDate '{pub_date_str}' for version {version}: {e}")
+            pub_time = None
+        entries.append((version, pub_date_str, pub_time))
+
+    # Sort by version number (newest first)
+    entries.sort(key=lambda x: safe_parse_version(x[0]), reverse=True)
+    return entries
+
+def _format_when(seconds_ago):
+    """Relative age such as '3 days ago' for a whole number of seconds."""
+    # Future pubDates (clock skew between registry and host) read as just published
+    minutes_ago = max(seconds_ago, 0) // 60
+    if minutes_ago < 60:
+        return f"{minutes_ago} minute{'s' if minutes_ago != 1 else ''} ago"
+    hours_ago = minutes_ago // 60
+    if hours_ago < 24:
+        return f"{hours_ago} hour{'s' if hours_ago != 1 else ''} ago"
+    days_ago = hours_ago // 24
+    return f"{days_ago} day{'s' if days_ago != 1 else ''} ago"
+
 @package_bp.route('/logs/<name>')
 def logs(name):
     """
@@ -25,7 +115,9 @@ def logs(name):
             current_app.logger.error(f"No in-memory cache found for package logs: {name}")
             return "<p class='text-muted'>Package cache not found.</p>"
 
-        package_data = next((pkg for pkg in in_memory_cache if isinstance(pkg, dict) and pkg.get('name', '').lower() == name.lower()), None)
+        name_lower = name.lower()
+        package_index = _get_package_index(in_memory_cache)
+        package_data = package_index['by_name'].get(name_lower)
         if not package_data:
             current_app.logger.error(f"Package not found in cache: {name}")
             return "<p class='text-muted'>Package not found.</p>"
@@ -36,51 +128,22 @@ def logs(name):
             current_app.logger.warning(f"No versions found for package: {name}. Package data: {package_data}")
             return "<p class='text-muted'>No version history found for this package.</p>"
 
-        current_app.logger.debug(f"Found {len(versions)} versions for package {name}: {versions[:5]}...")
-
-        logs = []
-        now = time.time()
-        for version_info in versions:
-            if not isinstance(version_info, dict):
-                current_app.logger.warning(f"Invalid version info for {name}: {version_info}")
-                continue
-            version = version_info.get('version', '')
-            pub_date_str = version_info.get('pubDate', '')
-            if not version or not pub_date_str:
-                current_app.logger.warning(f"Skipping version info with missing version or pubDate: {version_info}")
-                continue
-
-            # Parse pubDate and calculate "when"
-            when = "Unknown"
-            try:
-                pub_date = datetime.strptime(pub_date_str, "%a, %d %b %Y %H:%M:%S %Z")
-                pub_time = pub_date.timestamp()
-                time_diff = now - pub_time
-                days_ago = int(time_diff / 86400)
-                if days_ago < 1:
-                    hours_ago = int(time_diff / 3600)
-                    if hours_ago < 1:
-                        minutes_ago = int(time_diff / 60)
-                        when = f"{minutes_ago} minute{'s' if minutes_ago != 1 else ''} ago"
-                    else:
-                        when = f"{hours_ago} hour{'s' if hours_ago != 1 else ''} ago"
-                else:
-                    when = f"{days_ago} day{'s' if days_ago != 1 else ''} ago"
-            except ValueError as e:
-                current_app.logger.warning(f"Failed to parse pubDate '{pub_date_str}' for version {version}: {e}")
-
-            logs.append({
-                "version": version,
-                "pubDate": pub_date_str,
-                "when": when
-            })
-
-        if not logs:
+        # Validated, parsed and sorted once per cache load; only "when" depends on the current time
+        entries = package_index['logs'].get(name_lower)
+        if entries is None:
+            entries = _build_log_entries(name, versions)
+            package_index['logs'][name_lower] = entries
+
+        if not entries:
             current_app.logger.warning(f"No valid version entries with pubDate for package: {name}")
             return "<p class='text-muted'>No version history found for this package.</p>"
 
-        # Sort logs by version number (newest first)
-        logs.sort(key=lambda x: safe_parse_version(x.get('version', '0.0.0a0')), reverse=True)
+        now = int(time.time())
+        logs = [{
+            "version": version,
+            "pubDate": pub_date_str,
+            "when": _format_when(now - pub_time) if pub_time is not None else "Unknown"
+        } for version, pub_date_str, pub_time in entries]
 
         current_app.logger.debug(f"Rendering logs for {name} with {len(logs)} entries")
         return render_template('package.logs.html', logs=logs)
@@ -95,29 +158,18 @@ def dependents(name):
     HTMX endpoint to fetch packages that depend on the current package.
     Returns an HTML fragment with a table of dependent packages.
     """
-    in_memory_cache = current_app.config.get('MANUAL_PACKAGE_CACHE', [])
-    package_data = next((pkg for pkg in in_memory_cache if isinstance(pkg, dict) and pkg.get('name', '').lower() == name.lower()), None)
+    in_memory_cache = current_app.config.get('MANUAL_PACKAGE_CACHE')
+    if not in_memory_cache:
+        # Don't key the index on a throwaway empty list; that would rebuild it on every request
+        return "<p class='text-danger'>Package not found.</p>"
+    name_lower = name.lower()
+    package_index = _get_package_index(in_memory_cache)
+    package_data = package_index['by_name'].get(name_lower)
 
     if not package_data:
         return "<p class='text-danger'>Package not found.</p>"
 
-    # Find dependents: packages whose dependencies include the current package
-    dependents = []
-    for pkg in in_memory_cache:
-        if not isinstance(pkg, dict):
-            continue
-        dependencies = pkg.get('dependencies', [])
-        for dep in dependencies:
-            dep_name = dep.get('name', '')
-            if dep_name.lower() == name.lower():
-                dependents.append({
-                    "name": pkg.get('name', 'Unknown'),
-                    "version": pkg.get('latest_absolute_version', 'N/A'),
-                    "author": pkg.get('author', 'N/A'),
-                    "fhir_version": pkg.get('fhir_version', 'N/A'),
-                    "version_count": pkg.get('version_count', 0),
-                    "canonical": pkg.get('canonical', 'N/A')
-                })
-                break
+    # Packages whose dependencies include the current package, as prebuilt table rows
+    dependents = package_index['dependents'].get(name_lower, [])
 
     return render_template('package.dependents.html', dependents=dependents)
\ No newline at end of file
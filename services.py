@@ -6,10 +6,15 @@ import re
 import logging
 import shutil
 import sqlite3
+import hashlib
+import threading
 import feedparser
 from flask import current_app, Blueprint, request, jsonify
 from fhirpathpy import evaluate
-from collections import defaultdict, deque
+from collections import defaultdict, deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import nullcontext
+from functools import lru_cache
 from pathlib import Path
 from urllib.parse import quote, urlparse
 from types import SimpleNamespace
@@ -70,11 +75,107 @@ except ImportError:
         def __str__(self): return self.v_str
     pkg_version = SimpleNamespace(parse=BasicVersion, InvalidVersion=ValueError) # Mock parse and InvalidVersion
 
+# --- Check for optional 'orjson' library ---
+try:
+    import orjson
+    HAS_ORJSON = True
+    logger.info("Optional 'orjson' library found. Using for fast JSON parsing of package members.")
+except ImportError:
+    HAS_ORJSON = False
+    logger.warning("Optional 'orjson' library not found. Using stdlib json for package member parsing.")
+
+# --- Check for optional 'isal' library (ISA-L accelerated gzip) ---
+try:
+    from isal import igzip, isal_zlib
+    HAS_ISAL = True
+except ImportError:
+    HAS_ISAL = False
+
+# --- Check for optional 'xxhash' library ---
+try:
+    import xxhash
+    HAS_XXHASH = True
+except ImportError:
+    HAS_XXHASH = False
+
+_UTF8_BOM = b'\xef\xbb\xbf'
+# Cheap pre-filter on raw member bytes: a member can only be a StructureDefinition or
+# CapabilityStatement if one of these resourceType declarations appears somewhere in it.
+_PASS1_RESOURCE_TYPE_RE = re.compile(rb'"resourceType"\s*:\s*"(?:StructureDefinition|CapabilityStatement)"')
+_SD_RESOURCE_TYPE_RE = re.compile(rb'"resourceType"\s*:\s*"StructureDefinition"')
+
+def _json_loads_bytes(content_bytes):
+    """
+    Parses raw JSON bytes read from a package member, stripping a UTF-8 BOM if present.
+    Uses orjson when available (it accepts bytes directly), otherwise stdlib json.
+    Raises json.JSONDecodeError on invalid input (orjson's error subclasses it).
+    """
+    if content_bytes[:3] == _UTF8_BOM:
+        content_bytes = content_bytes[3:]
+    if HAS_ORJSON:
+        return orjson.loads(content_bytes)
+    return json.loads(content_bytes.decode('utf-8'))
+
+# Read size for the compressed stream; tarfile's default (20 * 512 bytes) means thousands of
+# tiny read/inflate calls for a multi-MB package.
+PACKAGE_TAR_READ_BUFSIZE = 1 << 20
+
+class _IgzipPackageStream:
+    """
+    Minimal read-only file object over ISA-L's igzip for tarfile's stream mode. Decompression
+    failures are re-raised as tarfile.ReadError, matching what 'r|gz' raises for corrupt data.
+    """
+    def __init__(self, tgz_path):
+        self.name = tgz_path
+        self._gz = igzip.GzipFile(tgz_path, mode='rb')
+
+    def read(self, size=-1):
+        try:
+            return self._gz.read(size)
+        except (OSError, EOFError, isal_zlib.error) as e:
+            raise tarfile.ReadError(f"invalid compressed data: {e}") from e
+
+    def close(self):
+        self._gz.close()
+
+class _IgzipStreamTarFile(tarfile.TarFile):
+    """TarFile that closes the _IgzipPackageStream it was opened on."""
+    _package_stream = None
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            if self._package_stream is not None:
+                self._package_stream.close()
+
+def _open_package_stream(tgz_path):
+    """
+    Opens a .tgz package for a single sequential pass ('r|gz' stream mode) with a large read buffer.
+    No index of members is built, so there is no seeking: callers must iterate with 'for member in tar'
+    and read each member via tar.extractfile(member) before moving on to the next one.
+    When 'isal' is installed, decompression goes through ISA-L's igzip instead of zlib.
+    """
+    if not HAS_ISAL:
+        return tarfile.open(tgz_path, mode="r|gz", bufsize=PACKAGE_TAR_READ_BUFSIZE)
+    stream = _IgzipPackageStream(tgz_path)
+    try:
+        tar = _IgzipStreamTarFile.open(fileobj=stream, mode="r|", bufsize=PACKAGE_TAR_READ_BUFSIZE)
+    except BaseException:
+        stream.close()
+        raise
+    tar._package_stream = stream
+    return tar
+
 # --- Constants ---
 FHIR_REGISTRY_BASE_URL = "https://packages.fhir.org"
 DOWNLOAD_DIR_NAME = "fhir_packages"
+DOWNLOAD_CHUNK_SIZE = 128 * 1024 # iter_content chunk size for package downloads
+IMPORT_MAX_WORKERS = 8 # Concurrent package downloads during recursive dependency import
 CANONICAL_PACKAGE = ("hl7.fhir.r4.core", "4.0.1")
 CANONICAL_PACKAGE_ID = f"{CANONICAL_PACKAGE[0]}#{CANONICAL_PACKAGE[1]}"
+# Package-level metadata files (lower-cased basenames) that are never FHIR resources
+PACKAGE_METADATA_FILENAMES = frozenset({'package.json', '.index.json', 'validation-summary.json', 'validation-oo.json'})
 
 # --- Define Canonical Types ---
 CANONICAL_RESOURCE_TYPES = {
@@ -131,7 +232,13 @@ def safe_parse_version(v_str):
     if not v_str or not isinstance(v_str, str):
         # Handle None or non-string input, treat as lowest possible version
         return pkg_version.parse("0.0.0a0") # Use alpha pre-release
+    return _parse_version_str(v_str)
 
+# Version strings repeat heavily (every cache load re-sorts each package's all_versions, /logs and
+# latest-version selection parse the same strings again), and Version objects are immutable, so
+# parsed results are shared.
+@lru_cache(maxsize=8192)
+def _parse_version_str(v_str):
     # Try standard parsing first
     try:
         return pkg_version.parse(v_str)
@@ -364,7 +471,7 @@ def download_manual_package(package_name, version, download_dir):
         response = requests.get(url, stream=True, timeout=30)
         response.raise_for_status()
         with open(target_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
                 f.write(chunk)
         logger.info(f"Manually downloaded {package_name}#{version} to {target_path}")
         return target_path
@@ -404,7 +511,7 @@ def download_manual_package_from_url(url, download_dir):
         response = requests.get(url, stream=True, timeout=30)
         response.raise_for_status()
         with open(target_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
                 f.write(chunk)
         logger.info(f"Manually downloaded package from {url} to {target_path}")
         return target_path
@@ -761,8 +868,11 @@ def cache_packages(normalized_packages, db, CachedPackage):
         CachedPackage: The CachedPackage model class.
     """
     try:
+        # Load existing rows once instead of a SELECT per package; new rows are inserted in a single flush
+        existing_by_key = {(row.package_name, row.version): row for row in CachedPackage.query.all()}
+        new_packages = []
         for package in normalized_packages:
-            existing = CachedPackage.query.filter_by(package_name=package['name'], version=package['version']).first()
+            existing = existing_by_key.get((package['name'], package['version']))
             if existing:
                 existing.author = package['author']
                 existing.fhir_version = package['fhir_version']
@@ -789,7 +899,9 @@ def cache_packages(normalized_packages, db, CachedPackage):
                     canonical=package['canonical'],
                     registry=package.get('registry', '')
                 )
-                db.session.add(new_package)
+                existing_by_key[(package['name'], package['version'])] = new_package
+                new_packages.append(new_package)
+        db.session.add_all(new_packages)
         db.session.commit()
         logger.info(f"Cached {len(normalized_packages)} packages in CachedPackage.")
     except Exception as error:
@@ -854,12 +966,20 @@ def get_package_description(package_name, package_version, packages_dir):
         logger.error(f"Error reading description from {tgz_filename}: {e}")
         return f"Error reading package details: {e}"
 
+# ASCII characters that sanitize_filename_part replaces with '_' (anything not alphanumeric, '.' or '-')
+_FILENAME_UNSAFE_ASCII_TABLE = {i: '_' for i in range(128) if not (chr(i).isalnum() or chr(i) in '.-')}
+_UNDERSCORE_RUN_RE = re.compile(r'_+')
+
 def sanitize_filename_part(text):
     """Basic sanitization for name/version parts of filename."""
     if not isinstance(text, str):
         text = str(text)
-    safe_text = "".join(c if c.isalnum() or c in ['.', '-'] else '_' for c in text)
-    safe_text = re.sub(r'_+', '_', safe_text)
+    if text.isascii():
+        safe_text = text.translate(_FILENAME_UNSAFE_ASCII_TABLE)
+    else:
+        # str.isalnum() keeps non-ASCII letters/digits, so fall back to the per-character check
+        safe_text = "".join(c if c.isalnum() or c in ['.', '-'] else '_' for c in text)
+    safe_text = _UNDERSCORE_RUN_RE.sub('_', safe_text)
     safe_text = safe_text.strip('_-.')
     return safe_text if safe_text else "invalid_name"
 
@@ -1189,7 +1309,7 @@ def cache_structure(package_name, package_version, resource_type, view, structur
 #--- OLD 
 
 # --- UPDATED: find_and_extract_sd function ---
-def find_and_extract_sd(tgz_path, resource_identifier, profile_url=None, include_narrative=False, raw=False):
+def find_and_extract_sd(tgz_path, resource_identifier, profile_url=None, include_narrative=False):
     """
     Helper to find and extract StructureDefinition json from a tgz path, prioritizing profile match.
     
@@ -1202,7 +1322,7 @@ def find_and_extract_sd(tgz_path, resource_identifier, profile_url=None, include
         logger.error(f"File not found in find_and_extract_sd: {tgz_path}")
         return None, None
     try:
-        with tarfile.open(tgz_path, "r:gz") as tar:
+        with _open_package_stream(tgz_path) as tar:
             logger.debug(f"Searching for SD matching '{resource_identifier}' with profile '{profile_url}' in {os.path.basename(tgz_path)}")
             potential_matches = []
             
@@ -1213,15 +1333,17 @@ def find_and_extract_sd(tgz_path, resource_identifier, profile_url=None, include
             for member in tar:
                 if not (member.isfile() and member.name.startswith('package/') and member.name.lower().endswith('.json')):
                     continue
-                if os.path.basename(member.name).lower() in ['package.json', '.index.json', 'validation-summary.json', 'validation-oo.json']:
+                if os.path.basename(member.name).lower() in PACKAGE_METADATA_FILENAMES:
                     continue
                 fileobj = None
                 try:
                     fileobj = tar.extractfile(member)
                     if fileobj:
                         content_bytes = fileobj.read()
-                        content_string = content_bytes.decode('utf-8-sig')
-                        data = json.loads(content_string)
+                        # Only StructureDefinitions can match; don't parse ValueSets, examples etc.
+                        if not _SD_RESOURCE_TYPE_RE.search(content_bytes):
+                            continue
+                        data = _json_loads_bytes(content_bytes)
                         if isinstance(data, dict) and data.get('resourceType') == 'StructureDefinition':
                             sd_id = data.get('id')
                             sd_name = data.get('name')
@@ -1279,13 +1401,6 @@ def find_and_extract_sd(tgz_path, resource_identifier, profile_url=None, include
                 logger.info(f"Selected best match for '{resource_identifier}' from potential matches (Score: {best_match[0]}): {found_path}")
             if sd_data is None:
                 logger.info(f"SD matching identifier '{resource_identifier}' or profile '{profile_url}' not found within archive {os.path.basename(tgz_path)}")
-            elif raw:
-                with tarfile.open(tgz_path, "r:gz") as tar:
-                    fileobj = tar.extractfile(found_path)
-                    content_bytes = fileobj.read()
-                    content_string = content_bytes.decode('utf-8-sig')
-                    raw_data = json.loads(content_string)
-                    return remove_narrative(raw_data, include_narrative), found_path
     except tarfile.ReadError as e:
         logger.error(f"Tar ReadError reading {tgz_path}: {e}")
         return None, None
@@ -1356,6 +1471,140 @@ def get_package_metadata(name, version):
         logger.debug(f"Metadata file not found: {metadata_path}")
         return None
 
+# Cross-package cache of StructureDefinition summaries keyed by a digest of the raw member bytes.
+# Many IGs ship byte-identical copies of the same SDs; a hit skips JSON parsing and the element walk.
+SD_SUMMARY_CACHE_MAX_ENTRIES = 4096
+_sd_summary_cache = OrderedDict()
+_sd_summary_cache_lock = threading.Lock()
+
+def _content_digest(content_bytes):
+    """Fast 128-bit digest of raw member bytes (xxhash when installed, else BLAKE2b)."""
+    if HAS_XXHASH:
+        return xxhash.xxh3_128_digest(content_bytes)
+    return hashlib.blake2b(content_bytes, digest_size=16).digest()
+
+def _get_cached_sd_summary(content_key):
+    with _sd_summary_cache_lock:
+        summary = _sd_summary_cache.get(content_key)
+        if summary is not None:
+            _sd_summary_cache.move_to_end(content_key)
+        return summary
+
+def _cache_sd_summary(content_key, summary):
+    with _sd_summary_cache_lock:
+        _sd_summary_cache[content_key] = summary
+        _sd_summary_cache.move_to_end(content_key)
+        if len(_sd_summary_cache) > SD_SUMMARY_CACHE_MAX_ENTRIES:
+            _sd_summary_cache.popitem(last=False)
+
+def _summarize_structure_definition(data):
+    """
+    Reduces a parsed StructureDefinition to what process_package_file needs: identity, type,
+    compliesWith/imposeProfile URLs and Must Support paths. The result only depends on the SD
+    content, so it is safe to cache by content digest.
+    """
+    complies_with = []
+    imposed = []
+    for ext in data.get('extension', []):
+        ext_url = ext.get('url')
+        value = ext.get('valueCanonical')
+        if value:
+            if ext_url == 'http://hl7.org/fhir/StructureDefinition/structuredefinition-compliesWithProfile':
+                complies_with.append(value)
+            elif ext_url == 'http://hl7.org/fhir/StructureDefinition/structuredefinition-imposeProfile':
+                imposed.append(value)
+
+    has_ms = False
+    ms_without_path = 0
+    ms_paths = set()
+    elements = data.get('snapshot', {}).get('element', []) or data.get('differential', {}).get('element', [])
+    for element in elements:
+        # Most elements are not Must Support; skip them before any other lookups
+        if not isinstance(element, dict) or element.get('mustSupport') is not True: continue
+        has_ms = True
+        element_id = element.get('id')
+        element_path = element.get('path')
+        if element_id and element_path:
+            # Use element ID as the key for MS paths unless it's a slice
+            slice_name = element.get('sliceName')
+            ms_paths.add(f"{element_path}[sliceName='{slice_name}']" if slice_name else element_id)
+        else:
+            ms_without_path += 1
+
+    return {
+        'profile_id': data.get('id') or data.get('name'),
+        'sd_type': data.get('type'),
+        'is_profile': bool(data.get('baseDefinition')),
+        'profile_meta': data.get('meta', {}).get('profile', []),
+        'complies_with': tuple(complies_with),
+        'imposed': tuple(imposed),
+        'has_ms': has_ms,
+        'ms_without_path': ms_without_path,
+        'ms_paths': frozenset(ms_paths),
+    }
+
+def _write_json_sidecar(path, obj):
+    """
+    Atomically writes obj as JSON to a cache file next to a package .tgz (temp file + os.replace), so
+    readers never see a partial file. Each write gets its own uniquely named temp file, so concurrent
+    scans of the same package can't interleave or replace each other's half-written output.
+    Caches are optional, so failures are only logged.
+    """
+    tmp_path = None
+    try:
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=os.path.dirname(path) or '.',
+                                         prefix=f"{os.path.basename(path)}.", suffix='.tmp', delete=False) as f:
+            tmp_path = f.name
+            json.dump(obj, f)
+        os.replace(tmp_path, path)
+        tmp_path = None
+    except (OSError, TypeError, ValueError) as e:
+        logger.warning(f"Could not write cache file {path}: {e}")
+    finally:
+        if tmp_path:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+# Bump when process_package_file's output changes so stale .scan.json files are ignored
+SCAN_CACHE_FORMAT_VERSION = 2
+
+def scan_cache_path(tgz_path):
+    """Path of the cached process_package_file results written next to a package .tgz."""
+    return f"{tgz_path[:-4] if tgz_path.endswith('.tgz') else tgz_path}.scan.json"
+
+def _read_scan_cache(cache_path, tgz_path):
+    """Returns cached process_package_file results if the cache is current for tgz_path, else None."""
+    try:
+        if not os.path.exists(cache_path) or os.path.getmtime(cache_path) < os.path.getmtime(tgz_path):
+            return None
+        with open(cache_path, 'rb') as f:
+            cached = _json_loads_bytes(f.read())
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning(f"Ignoring unreadable scan cache {cache_path}: {e}")
+        return None
+    if not isinstance(cached, dict) or cached.get('format_version') != SCAN_CACHE_FORMAT_VERSION:
+        return None
+    return cached.get('results')
+
+def _example_type_without_parsing(member_name, content_bytes):
+    """
+    The IG Publisher names examples '<ResourceType>-<id>.json'. If that prefix is a base resource type
+    declared in the content and the example claims no profile, the type is all Pass 2 needs, so the
+    JSON parse can be skipped. Returns None when a full parse is required.
+    Only single-resource files qualify: in a Bundle, Parameters or a resource with contained entries
+    the prefix may name a nested resource rather than the top-level type.
+    """
+    if b'"profile"' in content_bytes or content_bytes.count(b'"resourceType"') != 1:
+        return None
+    prefix = os.path.basename(member_name).split('-', 1)[0]
+    if prefix not in FHIR_R4_BASE_TYPES:
+        return None
+    if not re.search(rb'"resourceType"\s*:\s*"' + prefix.encode('ascii') + rb'"', content_bytes):
+        return None
+    return prefix
+
 def process_package_file(tgz_path):
     """
     Extracts types, profile status, MS elements, examples, profile relationships,
@@ -1367,6 +1616,12 @@ def process_package_file(tgz_path):
 
     pkg_basename = os.path.basename(tgz_path)
     name, version = parse_package_filename(tgz_path) # Assumes parse_package_filename exists
+
+    scan_cache_file = scan_cache_path(tgz_path)
+    cached_results = _read_scan_cache(scan_cache_file, tgz_path)
+    if cached_results is not None:
+        logger.info(f"Using cached processing results for {pkg_basename} ({name}#{version}) from {scan_cache_file}")
+        return cached_results
     logger.info(f"Processing package file details: {pkg_basename} ({name}#{version})")
 
     # Initialize results dictionary
@@ -1392,46 +1647,85 @@ def process_package_file(tgz_path):
         'optional_usage': False
     })
     referenced_types = set()
+    # Set mirrors of the ordered profile URL lists for O(1) duplicate checks
+    seen_complies_with = set()
+    seen_imposed = set()
     capability_statement_data = None # Store the main CapabilityStatement
 
     try:
-        with tarfile.open(tgz_path, "r:gz") as tar:
-            members = tar.getmembers()
-            logger.debug(f"Found {len(members)} members in {pkg_basename}")
-
-            # Filter for relevant JSON files once
-            json_members = []
-            for m in members:
-                if m.isfile() and m.name.startswith('package/') and m.name.lower().endswith('.json'):
-                     # Exclude common metadata files by basename
-                     basename_lower = os.path.basename(m.name).lower()
-                     if basename_lower not in ['package.json', '.index.json', 'validation-summary.json', 'validation-oo.json']:
-                         json_members.append(m)
-            logger.debug(f"Found {len(json_members)} potential JSON resource members.")
-
-            # --- Pass 1: Process StructureDefinitions and Find CapabilityStatement ---
-            logger.debug("Pass 1: Processing StructureDefinitions and finding CapabilityStatement...")
-            for member in json_members:
+        with _open_package_stream(tgz_path) as tar:
+            # --- Pass 1 (single archive scan): Process StructureDefinitions, find CapabilityStatement, collect Examples ---
+            # The tgz is only decompressed once; examples are recorded here and associated in Pass 2,
+            # once every profile ID is known.
+            logger.debug("Pass 1: Scanning archive for StructureDefinitions, CapabilityStatement and Examples...")
+            example_entries = [] # (member name, resourceType or None, meta.profile list)
+            member_count = 0
+            for member in tar:
+                member_count += 1
+                if not (member.isfile() and member.name.startswith('package/')):
+                    continue
+                # Exclude common metadata files by basename
+                basename_lower = os.path.basename(member.name).lower()
+                if basename_lower in PACKAGE_METADATA_FILENAMES:
+                    continue
+                is_json = member.name.lower().endswith('.json')
+                is_example = 'example' in member.name.lower()
+                if not is_json and not is_example:
+                    continue
+
+                if not is_json:
+                    # Non-JSON examples are associated by filename guess in Pass 2
+                    example_entries.append((member.name, None, None))
+                    continue
+
                 fileobj = None
                 try:
                     fileobj = tar.extractfile(member)
                     if not fileobj: continue
 
                     content_bytes = fileobj.read()
-                    # Handle potential BOM (Byte Order Mark)
-                    content_string = content_bytes.decode('utf-8-sig')
-                    data = json.loads(content_string)
+                    # Only SDs and CapabilityStatements matter here; skip building dicts for everything else.
+                    # Members that are never parsed (non-example resources, single-resource examples whose
+                    # type the filename gives away) are therefore not checked for JSON errors either.
+                    is_pass1_candidate = bool(_PASS1_RESOURCE_TYPE_RE.search(content_bytes))
+                    if not is_pass1_candidate:
+                        if not is_example: continue
+                        guessed_type = _example_type_without_parsing(member.name, content_bytes)
+                        if guessed_type:
+                            example_entries.append((member.name, guessed_type, None))
+                            continue
+                    # Identical SDs are shared across many packages; reuse their summary instead of re-parsing
+                    content_key = _content_digest(content_bytes) if is_pass1_candidate else None
+                    sd_summary = _get_cached_sd_summary(content_key) if content_key else None
+                    # Handles a potential BOM (Byte Order Mark)
+                    data = _json_loads_bytes(content_bytes) if sd_summary is None else None
+                except json.JSONDecodeError as e: logger.warning(f"JSON parse error in {member.name}: {e}"); results['errors'].append(f"JSON error in {member.name}"); continue
+                except UnicodeDecodeError as e: logger.warning(f"Encoding error in {member.name}: {e}"); results['errors'].append(f"Encoding error in {member.name}"); continue
+                except tarfile.TarError as e: logger.warning(f"TarError reading {member.name}: {e}"); results['errors'].append(f"Processing error in {member.name}: {e}"); continue
+                except Exception as e: logger.warning(f"Error processing member {member.name}: {e}", exc_info=False); results['errors'].append(f"Processing error in {member.name}: {e}"); continue
+                finally:
+                    if fileobj: fileobj.close()
 
-                    if not isinstance(data, dict): continue
+                if sd_summary is not None:
+                    resourceType = 'StructureDefinition'
+                elif isinstance(data, dict):
                     resourceType = data.get('resourceType')
+                else:
+                    continue
 
+                if is_example and resourceType:
+                    profile_meta = sd_summary['profile_meta'] if sd_summary is not None else data.get('meta', {}).get('profile', [])
+                    example_entries.append((member.name, resourceType, profile_meta))
+
+                try:
                     # --- Process StructureDefinition ---
                     if resourceType == 'StructureDefinition':
-                        data = remove_narrative(data) # Assumes remove_narrative exists
-                        profile_id = data.get('id') or data.get('name')
-                        sd_type = data.get('type')
-                        sd_base = data.get('baseDefinition')
-                        is_profile_sd = bool(sd_base)
+                        if sd_summary is None:
+                            sd_summary = _summarize_structure_definition(remove_narrative(data)) # Assumes remove_narrative exists
+                            _cache_sd_summary(content_key, sd_summary)
+                        profile_id = sd_summary['profile_id']
+                        sd_type = sd_summary['sd_type']
+                        is_profile_sd = sd_summary['is_profile']
 
                         if not profile_id or not sd_type:
                             logger.warning(f"Skipping SD {member.name}: missing ID ('{profile_id}') or Type ('{sd_type}').")
@@ -1448,43 +1742,23 @@ def process_package_file(tgz_path):
                         entry['sd_processed'] = True
                         referenced_types.add(sd_type)
 
-                        # Extract compliesWith/imposed profile URLs
-                        complies_with = []
-                        imposed = []
-                        for ext in data.get('extension', []):
-                            ext_url = ext.get('url')
-                            value = ext.get('valueCanonical')
-                            if value:
-                                if ext_url == 'http://hl7.org/fhir/StructureDefinition/structuredefinition-compliesWithProfile':
-                                    complies_with.append(value)
-                                elif ext_url == 'http://hl7.org/fhir/StructureDefinition/structuredefinition-imposeProfile':
-                                    imposed.append(value)
-                        # Add unique URLs to results
-                        results['complies_with_profiles'].extend(c for c in complies_with if c not in results['complies_with_profiles'])
-                        results['imposed_profiles'].extend(i for i in imposed if i not in results['imposed_profiles'])
+                        # Add unique compliesWith/imposed profile URLs to results
+                        for c in sd_summary['complies_with']:
+                            if c not in seen_complies_with:
+                                seen_complies_with.add(c)
+                                results['complies_with_profiles'].append(c)
+                        for i in sd_summary['imposed']:
+                            if i not in seen_imposed:
+                                seen_imposed.add(i)
+                                results['imposed_profiles'].append(i)
 
                         # Must Support and Optional Usage Logic
-                        has_ms_in_this_sd = False
-                        ms_paths_in_this_sd = set()
-                        elements = data.get('snapshot', {}).get('element', []) or data.get('differential', {}).get('element', [])
-                        for element in elements:
-                             if not isinstance(element, dict): continue
-                             must_support = element.get('mustSupport')
-                             element_id = element.get('id')
-                             element_path = element.get('path')
-                             slice_name = element.get('sliceName')
-                             if must_support is True:
-                                 if element_id and element_path:
-                                     # Use element ID as the key for MS paths unless it's a slice
-                                     ms_path_key = f"{element_path}[sliceName='{slice_name}']" if slice_name else element_id
-                                     ms_paths_in_this_sd.add(ms_path_key)
-                                     has_ms_in_this_sd = True
-                                 else:
-                                     logger.warning(f"MS=true without path/id in {entry_key} ({member.name})")
-                                     has_ms_in_this_sd = True
+                        has_ms_in_this_sd = sd_summary['has_ms']
+                        if sd_summary['ms_without_path']:
+                            logger.warning(f"MS=true without path/id in {entry_key} ({member.name}): {sd_summary['ms_without_path']} element(s)")
 
                         if has_ms_in_this_sd:
-                            entry['ms_paths'].update(ms_paths_in_this_sd)
+                            entry['ms_paths'].update(sd_summary['ms_paths'])
                             entry['ms_flag'] = True
 
                         if sd_type == 'Extension' and has_ms_in_this_sd:
@@ -1503,12 +1777,9 @@ def process_package_file(tgz_path):
                         else:
                              logger.warning(f"Found multiple CapabilityStatements. Using first found ({capability_statement_data.get('id', 'unknown')}). Ignoring {member.name}.")
 
-                # Error handling for individual file processing
-                except json.JSONDecodeError as e: logger.warning(f"JSON parse error in {member.name}: {e}"); results['errors'].append(f"JSON error in {member.name}")
-                except UnicodeDecodeError as e: logger.warning(f"Encoding error in {member.name}: {e}"); results['errors'].append(f"Encoding error in {member.name}")
+                # Error handling for individual resource processing
                 except Exception as e: logger.warning(f"Error processing member {member.name}: {e}", exc_info=False); results['errors'].append(f"Processing error in {member.name}: {e}")
-                finally:
-                    if fileobj: fileobj.close()
+            logger.debug(f"Scanned {member_count} members in {pkg_basename}; collected {len(example_entries)} potential examples.")
             # --- End Pass 1 ---
 
             # --- Pass 1.5: Process CapabilityStatement for Search Param Conformance ---
@@ -1561,86 +1832,57 @@ def process_package_file(tgz_path):
                  logger.warning(f"No CapabilityStatement found in package {pkg_basename}. Search parameter conformance data will be unavailable.")
             # --- End Pass 1.5 ---
 
-            # --- Pass 2: Process Examples ---
-            logger.debug("Pass 2: Processing Examples...")
-            example_members = [m for m in members if m.isfile() and m.name.startswith('package/') and 'example' in m.name.lower()]
-
-            for member in example_members:
-                # Skip metadata files again just in case
-                basename_lower = os.path.basename(member.name).lower()
-                if basename_lower in ['package.json', '.index.json', 'validation-summary.json', 'validation-oo.json']: continue
-
-                logger.debug(f"Processing potential example file: {member.name}")
-                is_json = member.name.lower().endswith('.json')
-                fileobj = None
+            # --- Pass 2: Associate Examples (collected during Pass 1, no archive access needed) ---
+            logger.debug("Pass 2: Associating Examples...")
+            for member_name, resource_type_ex, profile_meta in example_entries:
+                logger.debug(f"Processing potential example file: {member_name}")
                 associated_key = None
 
-                try:
-                    fileobj = tar.extractfile(member)
-                    if not fileobj: continue
-
-                    if is_json:
-                        content_bytes = fileobj.read()
-                        content_string = content_bytes.decode('utf-8-sig')
-                        data = json.loads(content_string)
-
-                        if not isinstance(data, dict): continue
-                        resource_type_ex = data.get('resourceType')
-                        if not resource_type_ex: continue
-
-                        # Find association key (profile or type)
-                        profile_meta = data.get('meta', {}).get('profile', [])
-                        found_profile_match = False
-                        if profile_meta and isinstance(profile_meta, list):
-                            for profile_url in profile_meta:
-                                if profile_url and isinstance(profile_url, str):
-                                    # Try matching by ID derived from profile URL first
-                                    profile_id_from_meta = profile_url.split('/')[-1]
-                                    if profile_id_from_meta in resource_info:
-                                        associated_key = profile_id_from_meta
-                                        found_profile_match = True
-                                        break
-                                    # Fallback to matching by full profile URL if needed
-                                    elif profile_url in resource_info:
-                                        associated_key = profile_url
-                                        found_profile_match = True
-                                        break
-                        # If no profile match, associate with base resource type
-                        if not found_profile_match:
-                            key_to_use = resource_type_ex
-                            # Ensure the base type exists in resource_info
-                            if key_to_use not in resource_info:
-                                resource_info[key_to_use].update({'name': key_to_use, 'type': resource_type_ex, 'is_profile': False})
-                            associated_key = key_to_use
-
-                        referenced_types.add(resource_type_ex) # Track type even if example has profile
-
-                    else: # Guessing for non-JSON examples
-                         guessed_type = basename_lower.split('-')[0].capitalize()
-                         guessed_profile_id = basename_lower.split('-')[0] # Often filename starts with profile ID
-                         key_to_use = None
-                         if guessed_profile_id in resource_info: key_to_use = guessed_profile_id
-                         elif guessed_type in resource_info: key_to_use = guessed_type
-                         else: # Add base type if not seen
-                              key_to_use = guessed_type
-                              resource_info[key_to_use].update({'name': key_to_use, 'type': key_to_use, 'is_profile': False})
-                         associated_key = key_to_use
-                         referenced_types.add(guessed_type)
-
-                    # Add example filename to the associated resource/profile
-                    if associated_key:
-                        resource_info[associated_key]['examples'].add(member.name)
-                        # logger.debug(f"Associated example {member.name} with {associated_key}")
-                    else:
-                        logger.warning(f"Could not associate example {member.name} with any known resource or profile.")
-
-                # --- CORRECTED INDENTATION FOR FINALLY BLOCK ---
-                except json.JSONDecodeError as e: logger.warning(f"Could not parse JSON example {member.name}: {e}")
-                except UnicodeDecodeError as e: logger.warning(f"Could not decode example {member.name}: {e}")
-                except tarfile.TarError as e: logger.warning(f"TarError reading example {member.name}: {e}")
-                except Exception as e: logger.warning(f"Could not process example member {member.name}: {e}", exc_info=False)
-                finally:
-                     if fileobj: fileobj.close()
+                if resource_type_ex:
+                    # Find association key (profile or type)
+                    found_profile_match = False
+                    if profile_meta and isinstance(profile_meta, list):
+                        for profile_url in profile_meta:
+                            if profile_url and isinstance(profile_url, str):
+                                # Try matching by ID derived from profile URL first
+                                profile_id_from_meta = profile_url.split('/')[-1]
+                                if profile_id_from_meta in resource_info:
+                                    associated_key = profile_id_from_meta
+                                    found_profile_match = True
+                                    break
+                                # Fallback to matching by full profile URL if needed
+                                elif profile_url in resource_info:
+                                    associated_key = profile_url
+                                    found_profile_match = True
+                                    break
+                    # If no profile match, associate with base resource type
+                    if not found_profile_match:
+                        key_to_use = resource_type_ex
+                        # Ensure the base type exists in resource_info
+                        if key_to_use not in resource_info:
+                            resource_info[key_to_use].update({'name': key_to_use, 'type': resource_type_ex, 'is_profile': False})
+                        associated_key = key_to_use
+
+                    referenced_types.add(resource_type_ex) # Track type even if example has profile
+
+                else: # Guessing for non-JSON examples
+                     basename_lower = os.path.basename(member_name).lower()
+                     guessed_type = basename_lower.split('-')[0].capitalize()
+                     guessed_profile_id = basename_lower.split('-')[0] # Often filename starts with profile ID
+                     key_to_use = None
+                     if guessed_profile_id in resource_info: key_to_use = guessed_profile_id
+                     elif guessed_type in resource_info: key_to_use = guessed_type
+                     else: # Add base type if not seen
+                          key_to_use = guessed_type
+                          resource_info[key_to_use].update({'name': key_to_use, 'type': key_to_use, 'is_profile': False})
+                     associated_key = key_to_use
+                     referenced_types.add(guessed_type)
+
+                # Add example filename to the associated resource/profile
+                if associated_key:
+                    resource_info[associated_key]['examples'].add(member_name)
+                else:
+                    logger.warning(f"Could not associate example {member_name} with any known resource or profile.")
             # --- End Pass 2 ---
 
             # --- Pass 3: Ensure Relevant Base Types ---
@@ -1677,10 +1919,10 @@ def process_package_file(tgz_path):
                 })
                 # Add Must Support paths if present
                 if info['ms_paths']:
-                     final_ms_elements[display_name] = sorted(list(info['ms_paths']))
+                     final_ms_elements[display_name] = sorted(info['ms_paths'])
                 # Add Examples if present
                 if info['examples']:
-                     final_examples[display_name] = sorted(list(info['examples']))
+                     final_examples[display_name] = sorted(info['examples'])
 
             # Store final lists/dicts in results
             results['resource_types_info'] = sorted(final_list, key=lambda x: (not x.get('is_profile', False), x.get('name', '')))
@@ -1710,6 +1952,8 @@ def process_package_file(tgz_path):
                 f"{total_examples} Exs; Comp={len(results['complies_with_profiles'])}; Imp={len(results['imposed_profiles'])}; "
                 f"ConfParams={total_conf_params} for {total_conf_types} types; Errors={len(results['errors'])}")
 
+    if not results['errors']:
+        _write_json_sidecar(scan_cache_file, {'format_version': SCAN_CACHE_FORMAT_VERSION, 'results': results})
     return results # Return the full results dictionary
 
 
@@ -1736,12 +1980,12 @@ def _legacy_navigate_fhir_path(resource, path, extension_url=None):
                 if isinstance(current[key], list) and index < len(current[key]):
                     current = current[key][index]
                 else:
-                    logger.debug(f"Path {part} invalid: key={key}, index={index}, current={current.get(key)}")
+                    logger.debug("Path %s invalid: key=%s, index=%s, current=%s", part, key, index, current.get(key))
                     return None
             elif isinstance(current, list) and index < len(current):
                 current = current[index]
             else:
-                logger.debug(f"Path {part} not found in current={current}")
+                logger.debug("Path %s not found in current=%s", part, current)
                 return None
         else:
             # Handle choice types (e.g., onset[x])
@@ -1754,7 +1998,7 @@ def _legacy_navigate_fhir_path(resource, path, extension_url=None):
                         current = current[test_key]
                         break
                 else:
-                    logger.debug(f"Choice type {part}[x] not found in current={current}")
+                    logger.debug("Choice type %s[x] not found in current=%s", part, current)
                     return None
             elif isinstance(current, dict):
                 if part in current:
@@ -1770,7 +2014,7 @@ def _legacy_navigate_fhir_path(resource, path, extension_url=None):
                     elif part == 'clinicalStatus' and 'coding' in current and isinstance(current['coding'], list) and current['coding']:
                         current = current['coding']
                     else:
-                        logger.debug(f"Path {part} not found in current={current}")
+                        logger.debug("Path %s not found in current=%s", part, current)
                         return None
             elif isinstance(current, list) and len(current) > 0:
                 # Try to find the part in list items
@@ -1782,13 +2026,13 @@ def _legacy_navigate_fhir_path(resource, path, extension_url=None):
                         break
                 if not found:
                     # For nested paths like communication.language, return None only if the parent is absent
-                    logger.debug(f"Path {part} not found in list items: {current}")
+                    logger.debug("Path %s not found in list items: %s", part, current)
                     return None
     if extension_url and isinstance(current, list):
         current = [item for item in current if item.get('url') == extension_url]
     # Return non-None/non-empty values as present
     result = current if (current is not None and (not isinstance(current, list) or current)) else None
-    logger.debug(f"Path {path} resolved to: {result}")
+    logger.debug("Path %s resolved to: %s", path, result)
     return result
 
 def navigate_fhir_path(resource, path, extension_url=None):
@@ -2524,7 +2768,7 @@ def get_structure_definition(package_name, version, resource_type):
         return {'error': f"No StructureDefinition for {resource_type}"}
 
     elements = sd_data.get('snapshot', {}).get('element', [])
-    must_support_paths = []
+    must_support_paths = set() # Deduplicated as collected
     slices = []
 
     # Process elements for must-support and slicing
@@ -2534,7 +2778,7 @@ def get_structure_definition(package_name, version, resource_type):
         slice_name = element.get('sliceName')
         if element.get('mustSupport', False):
             ms_path = f"{path}[sliceName='{slice_name}']" if slice_name else element_id
-            must_support_paths.append(ms_path)
+            must_support_paths.add(ms_path)
         if 'slicing' in element:
             slice_info = {
                 'path': path,
@@ -2556,7 +2800,7 @@ def get_structure_definition(package_name, version, resource_type):
     logger.debug(f"StructureDefinition for {resource_type}: {len(elements)} elements, {len(must_support_paths)} must-support paths, {len(slices)} slices")
     return {
         'elements': elements,
-        'must_support_paths': sorted(list(set(must_support_paths))),
+        'must_support_paths': sorted(must_support_paths),
         'slices': slices,
         'fallback_used': False
     }
@@ -2647,8 +2891,28 @@ def _load_definition(details, download_dir):
 #         logger.error(f"File write error for {save_path}: {e}")
 #         return None, f"File write error: {e}"
 
-def download_package(name, version, dependency_mode='none'):
-    """Downloads a FHIR package by name and version to the configured directory."""
+def _stream_response_to_file(response, target_path):
+    """
+    Streams a (stream=True) response body to target_path in DOWNLOAD_CHUNK_SIZE chunks.
+    Writes to a '.part' file first so an interrupted download never leaves a truncated
+    .tgz that the 'already downloaded' check would pick up.
+    """
+    part_path = f"{target_path}.part"
+    try:
+        with open(part_path, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                f.write(chunk)
+        os.replace(part_path, target_path)
+    finally:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+
+def download_package(name, version, dependency_mode='none', session=None):
+    """
+    Downloads a FHIR package by name and version to the configured directory.
+    Pass a requests.Session to reuse its pooled connections across several downloads.
+    """
+    http = session or requests
     download_dir = _get_download_dir()
     if not download_dir:
         return None, ["Could not determine download directory"]
@@ -2668,10 +2932,9 @@ def download_package(name, version, dependency_mode='none'):
     logger.info(f"Attempting download of {name}#{version} from {primary_url}")
 
     try:
-        response = requests.get(primary_url, timeout=30)
+        response = http.get(primary_url, stream=True, timeout=30)
         response.raise_for_status()
-        with open(download_path, 'wb') as f:
-            f.write(response.content)
+        _stream_response_to_file(response, download_path)
         logger.info(f"Successfully downloaded {name}#{version} to {download_path}")
         save_package_metadata(name, version, dependency_mode, [])
         return download_path, []
@@ -2721,10 +2984,9 @@ def download_package(name, version, dependency_mode='none'):
             fallback_url = f"{package_url.rstrip('/')}/{version}.tgz"
             logger.info(f"Attempting fallback download of {name}#{version} from {fallback_url}")
 
-            response = requests.get(fallback_url, timeout=30)
+            response = http.get(fallback_url, stream=True, timeout=30)
             response.raise_for_status()
-            with open(download_path, 'wb') as f:
-                f.write(response.content)
+            _stream_response_to_file(response, download_path)
             logger.info(f"Successfully downloaded {name}#{version} using fallback URL to {download_path}")
             save_package_metadata(name, version, dependency_mode, [])
             return download_path, []
@@ -2746,23 +3008,53 @@ def download_package(name, version, dependency_mode='none'):
 
     return None, errors
 
+def dependencies_cache_path(tgz_path):
+    """Path of the cached dependency map written next to a package .tgz by extract_dependencies."""
+    return f"{tgz_path[:-4] if tgz_path.endswith('.tgz') else tgz_path}.deps.json"
+
 def extract_dependencies(tgz_path):
-    """Extracts dependencies from package.json."""
+    """
+    Extracts dependencies from package.json.
+    A published name#version never changes, so the result is cached in a .deps.json sidecar next to
+    the .tgz and reused for as long as the sidecar is at least as new as the archive.
+    """
     package_json_path = "package/package.json"
     dependencies = {}
     error_message = None
     if not tgz_path or not os.path.exists(tgz_path): return None, "File not found"
+    sidecar_path = dependencies_cache_path(tgz_path)
     try:
-        with tarfile.open(tgz_path, "r:gz") as tar:
+        if os.path.exists(sidecar_path) and os.path.getmtime(sidecar_path) >= os.path.getmtime(tgz_path):
+            with open(sidecar_path, 'rb') as f:
+                cached = _json_loads_bytes(f.read())
+            if isinstance(cached, dict):
+                logger.debug(f"Using cached dependencies from {sidecar_path}")
+                return cached, None
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning(f"Ignoring unreadable dependency cache {sidecar_path}: {e}")
+    try:
+        with _open_package_stream(tgz_path) as tar:
             try:
-                pkg_member = tar.getmember(package_json_path)
+                # package.json is normally the first member; read it straight off the stream
+                pkg_member = next((m for m in tar if m.name == package_json_path), None)
+                if pkg_member is None: raise KeyError(package_json_path)
                 with tar.extractfile(pkg_member) as f:
-                    pkg_data = json.load(f)
+                    pkg_data = _json_loads_bytes(f.read())
                     dependencies = pkg_data.get('dependencies', {})
             except KeyError: error_message = "package.json not found"
             except (json.JSONDecodeError, tarfile.TarError) as e: error_message = f"Error reading package.json: {e}"
+            if not error_message:
+                # Read through to the end so a truncated or corrupt archive is reported (as the indexed
+                # read used to) instead of having its dependencies cached as if it were valid
+                try:
+                    for _ in tar: pass
+                except tarfile.TarError as e:
+                    dependencies = {}
+                    error_message = f"Error reading package archive: {e}"
     except tarfile.TarError as e: error_message = f"Error opening tarfile: {e}"
     except Exception as e: error_message = f"Unexpected error: {e}"
+    if not error_message and isinstance(dependencies, dict):
+        _write_json_sidecar(sidecar_path, dependencies)
     return dependencies, error_message
 
 def extract_used_types(tgz_path):
@@ -2776,7 +3068,7 @@ def extract_used_types(tgz_path):
             for member in tar:
                 if not (member.isfile() and member.name.startswith('package/') and member.name.lower().endswith('.json')):
                     continue
-                if os.path.basename(member.name).lower() in ['package.json', '.index.json', 'validation-summary.json', 'validation-oo.json']:
+                if os.path.basename(member.name).lower() in PACKAGE_METADATA_FILENAMES:
                     continue
                 fileobj = None
                 try:
@@ -2896,6 +3188,19 @@ def map_types_to_packages(used_types, all_dependencies, download_dir):
     logger.debug(f"Final type-to-package mapping: {type_to_package}")
     return type_to_package
 
+def _download_and_extract_dependencies(app, session, name, version):
+    """
+    Thread pool worker for import_package_and_dependencies: downloads one package and reads
+    its package.json dependencies. Runs inside an app context so config lookups keep working.
+    Returns (save_path, dl_error, dependencies, dep_error).
+    """
+    with app.app_context() if app else nullcontext():
+        save_path, dl_error = download_package(name, version, session=session)
+        if dl_error:
+            return save_path, dl_error, None, None
+        dependencies, dep_error = extract_dependencies(save_path)
+        return save_path, None, dependencies, dep_error
+
 def import_package_and_dependencies(initial_name, initial_version, dependency_mode='recursive'):
     """Orchestrates recursive download and dependency extraction."""
     logger.info(f"Starting import of {initial_name}#{initial_version} with mode {dependency_mode}")
@@ -2919,75 +3224,97 @@ def import_package_and_dependencies(initial_name, initial_version, dependency_mo
         'dependencies': [],
         'errors': []
     }
-    pending_queue = [(initial_name, initial_version)]
     queued_or_processed_lookup = set([(initial_name, initial_version)])
     all_found_dependencies = set()
 
-    while pending_queue:
-        name, version = pending_queue.pop(0)
-        package_id_tuple = (name, version)
-        if package_id_tuple in results['processed']:
-            logger.debug(f"Skipping already processed package: {name}#{version}")
-            continue
-        logger.info(f"Processing package {name}#{version}")
-        save_path, dl_error = download_package(name, version)
-        if dl_error:
-            logger.error(f"Download failed for {name}#{version}: {dl_error}")
-            results['errors'].append(f"Download failed for {name}#{version}: {dl_error}")
-            continue
-        tgz_filename = os.path.basename(save_path)
-        logger.info(f"Downloaded {tgz_filename}")
-        results['downloaded'][package_id_tuple] = save_path
-        logger.info(f"Extracting dependencies from {tgz_filename}")
-        dependencies, dep_error = extract_dependencies(save_path)
-        if dep_error:
-            logger.error(f"Dependency extraction failed for {name}#{version}: {dep_error}")
-            results['errors'].append(f"Dependency extraction failed for {name}#{version}: {dep_error}")
-            results['processed'].add(package_id_tuple)
-            continue
-        elif dependencies is None:
-            logger.error(f"Critical error in dependency extraction for {name}#{version}")
-            results['errors'].append(f"Dependency extraction returned critical error for {name}#{version}.")
-            results['processed'].add(package_id_tuple)
-            continue
-        results['all_dependencies'][package_id_tuple] = dependencies
-        results['processed'].add(package_id_tuple)
-        current_package_deps = []
-        for dep_name, dep_version in dependencies.items():
-            if isinstance(dep_name, str) and isinstance(dep_version, str) and dep_name and dep_version:
-                dep_tuple = (dep_name, dep_version)
-                current_package_deps.append({"name": dep_name, "version": dep_version})
-                if dep_tuple not in all_found_dependencies:
-                    all_found_dependencies.add(dep_tuple)
-                    results['dependencies'].append({"name": dep_name, "version": dep_version})
-                if dep_tuple not in queued_or_processed_lookup:
-                    should_queue = False
-                    if dependency_mode == 'recursive':
-                        should_queue = True
-                        logger.info(f"Queueing dependency {dep_name}#{dep_version} (recursive mode)")
-                    elif dependency_mode == 'patch-canonical' and dep_tuple == CANONICAL_PACKAGE:
-                        should_queue = True
-                        logger.info(f"Queueing canonical dependency {dep_name}#{dep_version} (patch-canonical mode)")
-                    if should_queue:
-                        logger.debug(f"Adding dependency to queue ({dependency_mode}): {dep_name}#{dep_version}")
-                        pending_queue.append(dep_tuple)
-                        queued_or_processed_lookup.add(dep_tuple)
-        logger.info(f"Saving metadata for {name}#{version}")
-        save_package_metadata(name, version, dependency_mode, current_package_deps)
-        if dependency_mode == 'tree-shaking' and package_id_tuple == (initial_name, initial_version):
-            logger.info(f"Performing tree-shaking for {initial_name}#{initial_version}")
-            used_types = extract_used_types(save_path)
-            if used_types:
-                type_to_package = map_types_to_packages(used_types, results['all_dependencies'], download_dir)
-                tree_shaken_deps = set(type_to_package.values()) - {package_id_tuple}
-                if CANONICAL_PACKAGE not in tree_shaken_deps:
-                    tree_shaken_deps.add(CANONICAL_PACKAGE)
-                    logger.info(f"Ensuring canonical package {CANONICAL_PACKAGE[0]}#{CANONICAL_PACKAGE[1]} for tree-shaking")
-                for dep_tuple in tree_shaken_deps:
-                    if dep_tuple not in queued_or_processed_lookup:
-                        logger.info(f"Queueing tree-shaken dependency {dep_tuple[0]}#{dep_tuple[1]}")
-                        pending_queue.append(dep_tuple)
-                        queued_or_processed_lookup.add(dep_tuple)
+    # Downloads are network-bound and independent, so they run on a thread pool. Each result is
+    # still consumed on this thread, so 'results' and the lookup sets need no locking.
+    try:
+        app = current_app._get_current_object()
+    except RuntimeError:
+        app = None
+    in_flight = {}
+    # One session for all workers, so downloads from the same registry reuse pooled connections
+    session = requests.Session()
+    session.mount('https://', requests.adapters.HTTPAdapter(pool_maxsize=IMPORT_MAX_WORKERS))
+    session.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=IMPORT_MAX_WORKERS))
+    executor = ThreadPoolExecutor(max_workers=IMPORT_MAX_WORKERS)
+
+    def queue_package(package_id_tuple):
+        future = executor.submit(_download_and_extract_dependencies, app, session, *package_id_tuple)
+        in_flight[future] = package_id_tuple
+
+    try:
+        queue_package((initial_name, initial_version))
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, version = in_flight.pop(future)
+                package_id_tuple = (name, version)
+                if package_id_tuple in results['processed']:
+                    logger.debug(f"Skipping already processed package: {name}#{version}")
+                    continue
+                logger.info(f"Processing package {name}#{version}")
+                save_path, dl_error, dependencies, dep_error = future.result()
+                if dl_error:
+                    logger.error(f"Download failed for {name}#{version}: {dl_error}")
+                    results['errors'].append(f"Download failed for {name}#{version}: {dl_error}")
+                    continue
+                tgz_filename = os.path.basename(save_path)
+                logger.info(f"Downloaded {tgz_filename}")
+                results['downloaded'][package_id_tuple] = save_path
+                logger.info(f"Extracted dependencies from {tgz_filename}")
+                if dep_error:
+                    logger.error(f"Dependency extraction failed for {name}#{version}: {dep_error}")
+                    results['errors'].append(f"Dependency extraction failed for {name}#{version}: {dep_error}")
+                    results['processed'].add(package_id_tuple)
+                    continue
+                elif dependencies is None:
+                    logger.error(f"Critical error in dependency extraction for {name}#{version}")
+                    results['errors'].append(f"Dependency extraction returned critical error for {name}#{version}.")
+                    results['processed'].add(package_id_tuple)
+                    continue
+                results['all_dependencies'][package_id_tuple] = dependencies
+                results['processed'].add(package_id_tuple)
+                current_package_deps = []
+                for dep_name, dep_version in dependencies.items():
+                    if isinstance(dep_name, str) and isinstance(dep_version, str) and dep_name and dep_version:
+                        dep_tuple = (dep_name, dep_version)
+                        current_package_deps.append({"name": dep_name, "version": dep_version})
+                        if dep_tuple not in all_found_dependencies:
+                            all_found_dependencies.add(dep_tuple)
+                            results['dependencies'].append({"name": dep_name, "version": dep_version})
+                        if dep_tuple not in queued_or_processed_lookup:
+                            should_queue = False
+                            if dependency_mode == 'recursive':
+                                should_queue = True
+                                logger.info(f"Queueing dependency {dep_name}#{dep_version} (recursive mode)")
+                            elif dependency_mode == 'patch-canonical' and dep_tuple == CANONICAL_PACKAGE:
+                                should_queue = True
+                                logger.info(f"Queueing canonical dependency {dep_name}#{dep_version} (patch-canonical mode)")
+                            if should_queue:
+                                logger.debug(f"Adding dependency to queue ({dependency_mode}): {dep_name}#{dep_version}")
+                                queue_package(dep_tuple)
+                                queued_or_processed_lookup.add(dep_tuple)
+                logger.info(f"Saving metadata for {name}#{version}")
+                save_package_metadata(name, version, dependency_mode, current_package_deps)
+                if dependency_mode == 'tree-shaking' and package_id_tuple == (initial_name, initial_version):
+                    logger.info(f"Performing tree-shaking for {initial_name}#{initial_version}")
+                    used_types = extract_used_types(save_path)
+                    if used_types:
+                        type_to_package = map_types_to_packages(used_types, results['all_dependencies'], download_dir)
+                        tree_shaken_deps = set(type_to_package.values()) - {package_id_tuple}
+                        if CANONICAL_PACKAGE not in tree_shaken_deps:
+                            tree_shaken_deps.add(CANONICAL_PACKAGE)
+                            logger.info(f"Ensuring canonical package {CANONICAL_PACKAGE[0]}#{CANONICAL_PACKAGE[1]} for tree-shaking")
+                        for dep_tuple in tree_shaken_deps:
+                            if dep_tuple not in queued_or_processed_lookup:
+                                logger.info(f"Queueing tree-shaken dependency {dep_tuple[0]}#{dep_tuple[1]}")
+                                queue_package(dep_tuple)
+                                queued_or_processed_lookup.add(dep_tuple)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        session.close()
     results['dependencies'] = [{"name": d[0], "version": d[1]} for d in all_found_dependencies]
     logger.info(f"Completed import of {initial_name}#{initial_version}. Processed {len(results['processed'])} packages, downloaded {len(results['downloaded'])}, with {len(results['errors'])} errors")
     return results
@@ -3385,7 +3712,7 @@ def find_and_extract_search_params(tgz_path, base_resource_type):
             for member in tar:
                 if not (member.isfile() and member.name.startswith('package/') and member.name.lower().endswith('.json')):
                     continue
-                if os.path.basename(member.name).lower() in ['package.json', '.index.json', 'validation-summary.json', 'validation-oo.json']:
+                if os.path.basename(member.name).lower() in PACKAGE_METADATA_FILENAMES:
                     continue
                 fileobj = None
                 try: